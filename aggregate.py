@@ -1,67 +1,111 @@
+import hashlib
 import logging
 import time
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
-import pandas as pd
+import numpy as np
 import pyodbc
 
-from utils import IngestionConfig, setup_logging, get_db_connection, ensure_table
+try:
+    import pyarrow as pa
+    import turbodbc
+except ImportError:  # optional: columnar fetch/insert via Arrow + NumPy
+    turbodbc = None
+
+from utils import (
+    IngestionConfig,
+    setup_logging,
+    get_db_connection,
+    ensure_table,
+    insert_rows,
+)
 
 class AggregateConfig:
     TARGET_TABLE = "final_summary"
     LOG_FILE      = "logs/aggregate.log"
-    QUERY = f"""
-    WITH FreightSummary AS (
-      SELECT
-        TRY_CAST(VendorNumber AS BIGINT) AS VendorNumber,
-        SUM(TRY_CAST(Freight AS DECIMAL(18,2))) AS FreightCost
-      FROM vendor_invoice
-      WHERE TRY_CAST(VendorNumber AS BIGINT) IS NOT NULL
-      GROUP BY TRY_CAST(VendorNumber AS BIGINT)
-    ),
-    PurchaseSummary AS (
-      SELECT
-        TRY_CAST(p.VendorNumber AS BIGINT)           AS VendorNumber,
-        LTRIM(RTRIM(p.VendorName))                   AS VendorName,
-        TRY_CAST(p.Brand AS BIGINT)                  AS Brand,
-        p.Description,
-        TRY_CAST(p.PurchasePrice AS DECIMAL(18,2))   AS PurchasePrice,
-        TRY_CAST(pp.Price AS DECIMAL(18,2))          AS ActualPrice,
-        TRY_CAST(pp.Volume AS BIGINT)                AS Volume,
-        SUM(TRY_CAST(p.Quantity AS BIGINT))          AS TotalPurchaseQuantity,
-        SUM(TRY_CAST(p.Dollars AS DECIMAL(18,2)))    AS TotalPurchaseDollars
-      FROM purchases p
-      JOIN purchase_prices pp
-        ON p.Brand = pp.Brand
-      WHERE
-        TRY_CAST(p.VendorNumber AS BIGINT)   IS NOT NULL
-        AND TRY_CAST(p.Brand AS BIGINT)       IS NOT NULL
-        AND TRY_CAST(p.PurchasePrice AS DECIMAL(18,2)) > 0
-      GROUP BY
-        TRY_CAST(p.VendorNumber AS BIGINT),
-        LTRIM(RTRIM(p.VendorName)),
-        TRY_CAST(p.Brand AS BIGINT),
-        p.Description,
-        TRY_CAST(p.PurchasePrice AS DECIMAL(18,2)),
-        TRY_CAST(pp.Price AS DECIMAL(18,2)),
-        pp.Volume
-    ),
-    SalesSummary AS (
-      SELECT
-        TRY_CAST(s.VendorNo AS BIGINT)              AS VendorNumber,
-        TRY_CAST(s.Brand AS BIGINT)                 AS Brand,
-        SUM(TRY_CAST(s.SalesQuantity AS BIGINT))    AS TotalSalesQuantity,
-        SUM(TRY_CAST(s.SalesDollars AS DECIMAL(18,2))) AS TotalSalesDollars,
-        SUM(TRY_CAST(s.SalesPrice AS DECIMAL(18,2))) AS TotalSalesPrice,
-        SUM(TRY_CAST(s.ExciseTax AS DECIMAL(18,2))) AS TotalExciseTax
-      FROM sales s
-      WHERE
-        TRY_CAST(s.VendorNo AS BIGINT) IS NOT NULL
-        AND TRY_CAST(s.Brand AS BIGINT) IS NOT NULL
-      GROUP BY
-        TRY_CAST(s.VendorNo AS BIGINT),
-        TRY_CAST(s.Brand AS BIGINT)
-    )
+    ENGINE        = "pyodbc"   # or "turbodbc"; only used with materialize_to_python=True
+    CACHE_TABLE   = "agg_cache_meta"
+    SOURCE_TABLES = ["purchases", "purchase_prices", "sales", "vendor_invoice"]
+    INDEX_COLUMNS = ["VendorNumber", "Brand"]  # clustered index on TARGET_TABLE
+    # Appended to every aggregation statement: don't recompile on stats drift
+    PLAN_HINT     = "OPTION (KEEPFIXED PLAN)"
+    COLUMNS = [
+        "VendorNumber", "VendorName", "Brand", "Description", "PurchasePrice",
+        "ActualPrice", "Volume", "TotalPurchaseQuantity", "TotalPurchaseDollars",
+        "TotalSalesQuantity", "TotalSalesDollars", "TotalSalesPrice", "TotalExciseTax",
+        "FreightCost", "GrossProfit", "ProfitMargin", "StockTurnover", "SalesToPurchaseRatio"
+    ]
+    COLUMN_TYPES = [
+        "BIGINT NULL", "VARCHAR(MAX) NULL", "BIGINT NULL", "VARCHAR(MAX) NULL",
+        "DECIMAL(18,2) NULL", "DECIMAL(18,2) NULL", "BIGINT NULL",
+        "BIGINT NULL", "DECIMAL(18,2) NULL", "BIGINT NULL",
+        "DECIMAL(18,2) NULL", "DECIMAL(18,2) NULL", "DECIMAL(18,2) NULL",
+        "DECIMAL(18,2) NULL", "DECIMAL(18,2) NULL", "DECIMAL(18,2) NULL",
+        "DECIMAL(18,2) NULL", "DECIMAL(18,2) NULL"
+    ]
+    # Persisted per-source summaries (typed staging columns, no TRY_CAST),
+    # rebuilt on each aggregation run and indexed on the join keys.
+    # purchase_summary groups on VARCHAR(MAX) Description, which can't key
+    # an indexed view, so it stays a table.
+    SUMMARY_TABLES = {
+        "purchase_summary": ("""
+          SELECT
+            p.VendorNumber,
+            LTRIM(RTRIM(p.VendorName))   AS VendorName,
+            p.Brand,
+            p.Description,
+            p.PurchasePrice,
+            COALESCE(pp.Price, 0)        AS ActualPrice,
+            COALESCE(pp.Volume, 0)       AS Volume,
+            COALESCE(SUM(p.Quantity), 0) AS TotalPurchaseQuantity,
+            COALESCE(SUM(p.Dollars), 0)  AS TotalPurchaseDollars
+          FROM purchases p
+          JOIN purchase_prices pp
+            ON p.Brand = pp.Brand
+          WHERE
+            p.VendorNumber IS NOT NULL
+            AND p.Brand IS NOT NULL
+            AND p.PurchasePrice > 0
+          GROUP BY
+            p.VendorNumber,
+            LTRIM(RTRIM(p.VendorName)),
+            p.Brand,
+            p.Description,
+            p.PurchasePrice,
+            COALESCE(pp.Price, 0),
+            COALESCE(pp.Volume, 0)
+        """, ["VendorNumber", "Brand"]),
+    }
+    # Indexed views: SQL Server maintains these as the staging tables change.
+    # They need SCHEMABINDING, two-part names, COUNT_BIG(*) and SUMs over
+    # non-nullable expressions; the unique clustered index is on the keys.
+    SUMMARY_VIEWS = {
+        "freight_summary": ("""
+          SELECT
+            VendorNumber,
+            SUM(ISNULL(Freight, 0)) AS FreightCost,
+            COUNT_BIG(*)            AS InvoiceCount
+          FROM dbo.vendor_invoice
+          WHERE VendorNumber IS NOT NULL
+          GROUP BY VendorNumber
+        """, ["VendorNumber"]),
+        "sales_summary": ("""
+          SELECT
+            VendorNo                      AS VendorNumber,
+            Brand,
+            SUM(ISNULL(SalesQuantity, 0)) AS TotalSalesQuantity,
+            SUM(ISNULL(SalesDollars, 0))  AS TotalSalesDollars,
+            SUM(ISNULL(SalesPrice, 0))    AS TotalSalesPrice,
+            SUM(ISNULL(ExciseTax, 0))     AS TotalExciseTax,
+            COUNT_BIG(*)                  AS SalesCount
+          FROM dbo.sales
+          WHERE
+            VendorNo IS NOT NULL
+            AND Brand IS NOT NULL
+          GROUP BY VendorNo, Brand
+        """, ["VendorNumber", "Brand"]),
+    }
+    QUERY_NO_ORDER = """
     SELECT
       ps.VendorNumber,
       ps.VendorName,
@@ -92,72 +136,324 @@ class AggregateConfig:
         WHEN ps.TotalPurchaseDollars = 0 THEN 0
         ELSE COALESCE(ss.TotalSalesDollars,0) / ps.TotalPurchaseDollars
       END AS SalesToPurchaseRatio
-    FROM PurchaseSummary ps
-    LEFT JOIN SalesSummary    ss ON ps.VendorNumber = ss.VendorNumber AND ps.Brand = ss.Brand
-    LEFT JOIN FreightSummary fs ON ps.VendorNumber = fs.VendorNumber
-    ORDER BY ps.TotalPurchaseDollars DESC;
+    FROM purchase_summary ps
+    LEFT JOIN sales_summary   ss WITH (NOEXPAND) ON ps.VendorNumber = ss.VendorNumber AND ps.Brand = ss.Brand
+    LEFT JOIN freight_summary fs WITH (NOEXPAND) ON ps.VendorNumber = fs.VendorNumber
+    """
+    QUERY = QUERY_NO_ORDER + """    ORDER BY ps.TotalPurchaseDollars DESC;
+    """
+
+def _final_select(columns: List[str], types: List[str], into: Optional[str] = None) -> str:
+    """
+    The aggregation query projected onto `columns`. Every numeric column is
+    already COALESCEd in SQL, so no fillna(0) pass is needed anywhere. With
+    `into`, columns are CAST to their target types so SELECT … INTO creates
+    the same schema.
+    """
+    exprs = []
+    for c, t in zip(columns, types):
+        expr = f"CAST(t.[{c}] AS {t.replace(' NULL', '')})" if into else f"t.[{c}]"
+        exprs.append(f"{expr} AS [{c}]")
+    into_clause = f" INTO {into}" if into else ""
+    return (
+        f"SELECT {', '.join(exprs)}{into_clause} "
+        f"FROM ({AggregateConfig.QUERY_NO_ORDER}) AS t {AggregateConfig.PLAN_HINT}"
+    )
+
+
+def _execute_cached(cursor: pyodbc.Cursor, sql: str) -> int:
+    """
+    Run a statement through sp_executesql, so its compiled plan is cached
+    as a reusable parameterized entry instead of an ad-hoc batch.
+    Returns the statement's row count.
+    """
+    cursor.execute(
+        "SET NOCOUNT ON; "
+        "DECLARE @rows BIGINT; "
+        "EXEC sp_executesql ?, N'@rows BIGINT OUTPUT', @rows = @rows OUTPUT; "
+        "SET NOCOUNT OFF; "
+        "SELECT @rows;",
+        f"{sql}; SET @rows = @@ROWCOUNT;"
+    )
+    return cursor.fetchone()[0]
+
+
+def _aggregate_on_server(
+    cursor: pyodbc.Cursor,
+    target_table: str,
+    columns: List[str],
+    types: List[str],
+    select_into: bool = True,
+) -> int:
+    """
+    Set-based variant: the result never leaves the server.
+
+    select_into=True drops the table and rebuilds it with a minimally logged
+    SELECT … INTO (under SIMPLE / BULK_LOGGED recovery), then indexes it.
+    select_into=False keeps the Python-side schema via ensure_table and fills
+    it with INSERT … SELECT.
+    """
+    if select_into:
+        logging.info(f"Rebuilding `{target_table}` server-side (SELECT … INTO)")
+        cursor.execute(f"IF OBJECT_ID(N'{target_table}', 'U') IS NOT NULL DROP TABLE {target_table};")
+        total_rows = _execute_cached(cursor, _final_select(columns, types, into=target_table))
+        col_list = ", ".join(f"[{c}]" for c in AggregateConfig.INDEX_COLUMNS)
+        cursor.execute(f"CREATE CLUSTERED INDEX ix_{target_table} ON {target_table} ({col_list});")
+        return total_rows
+
+    logging.info(f"Recreating target table `{target_table}`")
+    ensure_table(cursor, target_table, columns, types)
+
+    col_list = ", ".join(f"[{c}]" for c in columns)
+    logging.info("Executing aggregation query server-side (INSERT … SELECT)")
+    return _execute_cached(
+        cursor,
+        f"INSERT INTO {target_table} WITH (TABLOCK) ({col_list}) "
+        f"{_final_select(columns, types)}"
+    )
+
+
+def _column_array(col: "pa.ChunkedArray") -> np.ndarray:
+    """
+    Arrow column → NumPy buffer for executemanycolumns. Numeric NULLs go in
+    a mask, so integers stay int64 rather than becoming NaN floats.
+    """
+    if col.null_count and (pa.types.is_integer(col.type) or pa.types.is_floating(col.type)):
+        return np.ma.masked_array(
+            col.fill_null(0).to_numpy(),
+            mask=col.is_null().to_numpy(zero_copy_only=False),
+        )
+    # strings come back as an object array with None for NULL
+    return col.to_numpy(zero_copy_only=False)
+
+
+def _aggregate_with_turbodbc(
+    conn_string: str,
+    target_table: str,
+    columns: List[str],
+    types: List[str],
+) -> int:
+    """
+    Columnar variant: fetch the result as Arrow and insert its column
+    buffers, so no per-row Python objects are built on either side.
+    """
+    # prefer_unicode binds str parameters as NVARCHAR, which sp_executesql
+    # requires for its statement (VARCHAR fails with Msg 214)
+    conn = turbodbc.connect(
+        connection_string=conn_string,
+        turbodbc_options=turbodbc.make_options(prefer_unicode=True),
+    )
+    cursor = conn.cursor()
+    try:
+        # 1) Read aggregated result straight into Arrow buffers
+        logging.info("Executing aggregation query (turbodbc/Arrow)")
+        cursor.execute("EXEC sp_executesql ?;", [_final_select(columns, types)])
+        table = cursor.fetchallarrow()
+        arrays = [_column_array(table.column(i)) for i in range(table.num_columns)]
+        total_rows = table.num_rows
+        del table
+
+        # 2) Ensure target schema
+        logging.info(f"Recreating target table `{target_table}`")
+        ensure_table(cursor, target_table, columns, types)
+
+        # 3) Ship whole columns once; turbodbc batches internally
+        placeholders = ", ".join("?" for _ in columns)
+        col_list = ", ".join(f"[{c}]" for c in columns)
+        insert_sql = f"INSERT INTO {target_table} ({col_list}) VALUES ({placeholders})"
+        logging.info(f"Inserting {total_rows} rows column-wise")
+        cursor.executemanycolumns(insert_sql, arrays)
+
+        conn.commit()
+        return total_rows
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def refresh_summaries(cursor: pyodbc.Cursor) -> None:
+    """
+    Rebuild the persisted summary tables and indexed views from the typed
+    staging tables.
+    """
+    for table_name, (select_sql, index_cols) in AggregateConfig.SUMMARY_TABLES.items():
+        logging.info(f"Refreshing summary table `{table_name}`")
+        cursor.execute(f"IF OBJECT_ID(N'{table_name}', 'U') IS NOT NULL DROP TABLE {table_name};")
+        _execute_cached(
+            cursor,
+            f"SELECT * INTO {table_name} FROM ({select_sql}) AS src {AggregateConfig.PLAN_HINT}"
+        )
+        col_list = ", ".join(f"[{c}]" for c in index_cols)
+        cursor.execute(f"CREATE CLUSTERED INDEX ix_{table_name} ON {table_name} ({col_list});")
+
+    for view_name, (select_sql, index_cols) in AggregateConfig.SUMMARY_VIEWS.items():
+        logging.info(f"Refreshing indexed view `{view_name}`")
+        # also clears a same-named table left by older runs
+        cursor.execute(f"IF OBJECT_ID(N'{view_name}', 'U') IS NOT NULL DROP TABLE {view_name};")
+        cursor.execute(f"IF OBJECT_ID(N'{view_name}', 'V') IS NOT NULL DROP VIEW {view_name};")
+        # CREATE VIEW must be alone in its batch
+        cursor.execute(f"CREATE VIEW dbo.{view_name} WITH SCHEMABINDING AS {select_sql}")
+        col_list = ", ".join(f"[{c}]" for c in index_cols)
+        cursor.execute(
+            f"CREATE UNIQUE CLUSTERED INDEX ix_{view_name} ON dbo.{view_name} ({col_list});"
+        )
+
+
+def _source_fingerprint(
+    cursor: pyodbc.Cursor,
+    tables: List[str] = AggregateConfig.SOURCE_TABLES
+) -> str:
+    """
+    Cheap content fingerprint (row count + checksum) of the source tables,
+    prefixed with a hash of the aggregation definition so editing the
+    query, summaries or output schema also invalidates the cache.
+    """
+    definition = repr((
+        AggregateConfig.QUERY_NO_ORDER,
+        AggregateConfig.SUMMARY_TABLES,
+        AggregateConfig.SUMMARY_VIEWS,
+        AggregateConfig.COLUMNS,
+        AggregateConfig.COLUMN_TYPES,
+    ))
+    parts = [hashlib.sha1(definition.encode("utf-8")).hexdigest()]
+    for table in tables:
+        cursor.execute(f"SELECT COUNT_BIG(*), CHECKSUM_AGG(CHECKSUM(*)) FROM {table};")
+        count, checksum = cursor.fetchone()
+        parts.append(f"{table}:{count}:{checksum}")
+    return "|".join(parts)
+
+
+def _cached_fingerprint(cursor: pyodbc.Cursor, target_table: str) -> Optional[str]:
+    """
+    Fingerprint stored by the last successful run, if `target_table` and
+    every summary object still exist. Reloading a staging table drops the
+    indexed views on it without changing its fingerprint, so a missing
+    view must count as a cache miss.
+    """
+    cache = AggregateConfig.CACHE_TABLE
+    summaries_exist = "".join(
+        [f" AND OBJECT_ID(N'{t}', 'U') IS NOT NULL" for t in AggregateConfig.SUMMARY_TABLES]
+        + [f" AND OBJECT_ID(N'{v}', 'V') IS NOT NULL" for v in AggregateConfig.SUMMARY_VIEWS]
+    )
+    cursor.execute(
+        f"IF OBJECT_ID(N'{cache}', 'U') IS NULL "
+        f"CREATE TABLE {cache} ("
+        "TargetTable VARCHAR(128) NOT NULL PRIMARY KEY, "
+        "Fingerprint VARCHAR(MAX) NOT NULL, "
+        "UpdatedAt DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME());"
+    )
+    cursor.execute(
+        f"SELECT Fingerprint FROM {cache} "
+        f"WHERE TargetTable = ? AND OBJECT_ID(?, 'U') IS NOT NULL{summaries_exist};",
+        target_table, target_table
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _store_fingerprint(cursor: pyodbc.Cursor, target_table: str, fingerprint: str) -> None:
+    """
+    Upsert the fingerprint the current `target_table` contents were built from.
+    """
+    cursor.execute(
+        f"MERGE {AggregateConfig.CACHE_TABLE} AS m "
+        "USING (SELECT ? AS TargetTable, ? AS Fingerprint) AS s "
+        "ON m.TargetTable = s.TargetTable "
+        "WHEN MATCHED THEN UPDATE SET Fingerprint = s.Fingerprint, UpdatedAt = SYSUTCDATETIME() "
+        "WHEN NOT MATCHED THEN INSERT (TargetTable, Fingerprint) VALUES (s.TargetTable, s.Fingerprint);",
+        target_table, fingerprint
+    )
+
+
+def _aggregate_with_pyodbc(
+    cursor: pyodbc.Cursor,
+    conn_string: str,
+    target_table: str,
+    columns: List[str],
+    types: List[str],
+    batch_size: int,
+) -> int:
+    """
+    Row variant: stream the result with fetchmany and executemany each batch
+    back, so at most one batch is held in Python memory.
     """
+    logging.info(f"Recreating target table `{target_table}`")
+    ensure_table(cursor, target_table, columns, types)
+
+    # pyodbc allows one active statement per connection (short of MARS),
+    # so the result set is read on a second connection
+    total_rows = 0
+    bound = None
+    with get_db_connection(conn_string) as read_cursor:
+        logging.info(f"Executing aggregation query, streaming in batches of {batch_size}")
+        read_cursor.execute("EXEC sp_executesql ?;", _final_select(columns, types))
+        try:
+            while True:
+                rows = read_cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                bound = insert_rows(cursor, target_table, columns, types, rows, bound)
+                total_rows += len(rows)
+        finally:
+            # Bindings persist on the cursor; clear them before it runs
+            # unrelated statements (the fingerprint update)
+            cursor.setinputsizes(None)
+    return total_rows
+
 
 def aggregate_and_store(
     conn_string: str = IngestionConfig.CONN_STRING,
     target_table: str = AggregateConfig.TARGET_TABLE,
     log_file: str = AggregateConfig.LOG_FILE,
     log_level: int = IngestionConfig.LOG_LEVEL,
-    batch_size: int = 5_000
+    batch_size: int = 5_000,
+    engine: str = AggregateConfig.ENGINE,
+    force: bool = False,
+    materialize_to_python: bool = False,
+    select_into: bool = True,
 ) -> None:
     """
-    Run server‐side aggregation, pull results, and bulk‑insert into target_table.
+    Run server‐side aggregation and store the result in target_table.
+
+    By default this is a single SELECT … INTO on the server (INSERT … SELECT
+    into the ensure_table schema with select_into=False). With
+    materialize_to_python=True the result is streamed through Python and
+    bulk‑inserted back; there engine="turbodbc" reads/writes through Arrow
+    column buffers, with pyodbc kept as fallback. The run is skipped when
+    the source tables are unchanged since the last one, unless force=True.
     """
     setup_logging(log_file, log_level)
     logging.info("Starting aggregation and storage…")
     t0 = time.time()
+    columns = AggregateConfig.COLUMNS
+    types = AggregateConfig.COLUMN_TYPES
 
     try:
-        # Single connection for both read & write
         with get_db_connection(conn_string) as cursor:
             conn = cursor.connection
 
-            # 1) Read aggregated result into DataFrame
-            logging.info("Executing aggregation query")
-            df = pd.read_sql_query(AggregateConfig.QUERY, conn)
-
-            # 2) Light Python clean‑up
-            logging.info("Cleaning DataFrame")
-            df.fillna(0, inplace=True)
-            # VendorName was already trimmed in SQL
-
-            # 3) Ensure target schema
-            columns = [
-                "VendorNumber", "VendorName", "Brand", "Description", "PurchasePrice",
-                "ActualPrice", "Volume", "TotalPurchaseQuantity", "TotalPurchaseDollars",
-                "TotalSalesQuantity", "TotalSalesDollars", "TotalSalesPrice", "TotalExciseTax",
-                "FreightCost", "GrossProfit", "ProfitMargin", "StockTurnover", "SalesToPurchaseRatio"
-            ]
-            types = [
-                "BIGINT NULL", "VARCHAR(MAX) NULL", "BIGINT NULL", "VARCHAR(MAX) NULL",
-                "DECIMAL(18,2) NULL", "DECIMAL(18,2) NULL", "BIGINT NULL",
-                "BIGINT NULL", "DECIMAL(18,2) NULL", "BIGINT NULL",
-                "DECIMAL(18,2) NULL", "DECIMAL(18,2) NULL", "DECIMAL(18,2) NULL",
-                "DECIMAL(18,2) NULL", "DECIMAL(18,2) NULL", "DECIMAL(18,2) NULL",
-                "DECIMAL(18,2) NULL", "DECIMAL(18,2) NULL"
-            ]
-            logging.info(f"Recreating target table `{target_table}`")
-            ensure_table(cursor, target_table, columns, types)
-
-            # 4) Bulk insert in batches
-            placeholders = ", ".join("?" for _ in columns)
-            col_list = ", ".join(f"[{c}]" for c in columns)
-            insert_sql = f"INSERT INTO {target_table} ({col_list}) VALUES ({placeholders})"
-            cursor.fast_executemany = True
-
-            total_rows = len(df)
-            inserted = 0
-            logging.info(f"Inserting {total_rows} rows in batches of {batch_size}")
-            while inserted < total_rows:
-                batch = df.iloc[inserted : inserted + batch_size]
-                cursor.executemany(insert_sql, batch.values.tolist())
-                inserted += len(batch)
+            # Skip the whole run if the inputs haven't changed
+            fingerprint = _source_fingerprint(cursor)
+            if not force and _cached_fingerprint(cursor, target_table) == fingerprint:
+                logging.info(f"Sources unchanged — reusing cached aggregation in `{target_table}`")
+                return
+
+            # Materialize the per-source summaries the final query joins
+            refresh_summaries(cursor)
+            conn.commit()
+
+            if not materialize_to_python:
+                total_rows = _aggregate_on_server(cursor, target_table, columns, types, select_into)
+            elif engine == "turbodbc" and turbodbc is not None:
+                total_rows = _aggregate_with_turbodbc(conn_string, target_table, columns, types)
+            else:
+                if engine == "turbodbc":
+                    logging.warning("turbodbc not installed — falling back to pyodbc")
+                total_rows = _aggregate_with_pyodbc(
+                    cursor, conn_string, target_table, columns, types, batch_size
+                )
 
+            _store_fingerprint(cursor, target_table, fingerprint)
             conn.commit()
             elapsed = time.time() - t0
             logging.info(f"Inserted {total_rows} rows into `{target_table}` in {elapsed:.2f}s")
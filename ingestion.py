@@ -1,100 +1,103 @@
 import os
 import logging
-from typing import List, Optional, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, List, Optional, Iterator, Tuple, Union
 
 import pandas as pd
-import pyodbc
 
 from utils import (
     IngestionConfig,
     setup_logging,
     get_db_connection,
-    ensure_table,
+    read_csv_chunks,
+    ingest_file,
 )
 from aggregate import aggregate_and_store
 
 
 def read_csv_in_chunks(
-    file_path: str,
+    source: Union[str, BinaryIO],
     columns: List[str],
     encoding: str = IngestionConfig.ENCODING,
     chunk_size: int = IngestionConfig.CHUNK_SIZE,
 ) -> Iterator[pd.DataFrame]:
     """
-    Yield DataFrame chunks from a CSV file, with sanitized column names.
+    Yield DataFrame chunks from a CSV file (or a handle past its header),
+    with sanitized column names.
     """
-    # pandas will take care of skipping empty lines, quoting, etc.
-    return pd.read_csv(
-        file_path,
-        encoding=encoding,
-        names=columns,
-        header=0,
-        dtype=str,
-        chunksize=chunk_size,
-        na_filter=False,  # empty strings instead of NaN
-    )
+    # PyArrow (or pandas) takes care of skipping empty lines, quoting, etc.
+    return read_csv_chunks(source, columns, encoding=encoding, chunk_size=chunk_size)
 
 
 def ingest_table_from_csv(
-    cursor: pyodbc.Cursor,
+    conn_string: str,
     folder_path: str,
     fname: str,
     column_types: Optional[List[str]]
 ) -> None:
     """
     Ingest a single CSV file into its corresponding SQL table.
+    Opens (and commits) its own connection so it can run in a worker process.
     """
     table_name = os.path.splitext(fname)[0]
     file_path = os.path.join(folder_path, fname)
 
-    if os.path.getsize(file_path) == 0:
-        logging.warning(f"Skipping empty file: {file_path}")
-        return
-
-    # Read just the header line to get the columns
-    with open(file_path, encoding=IngestionConfig.ENCODING) as f:
-        raw_cols = next(f).strip().split(",")
-    # sanitize
-    columns = [c.strip().replace(" ", "_") for c in raw_cols]
-
-    logging.info(f"Ingesting `{file_path}` → table `{table_name}`")
-    ensure_table(cursor, table_name, columns, column_types)
+    # The load sequence (BULK INSERT, then the chunked fallback) lives in
+    # utils.ingest_file; this worker only owns the connection
+    with get_db_connection(conn_string) as cursor:
+        ingest_file(cursor, file_path, table_name, column_types=column_types)
 
-    # Pre-build the INSERT statement
-    cols_escaped = ", ".join(f"[{c}]" for c in columns)
-    placeholders = ", ".join("?" for _ in columns)
-    insert_sql = (
-        f"INSERT INTO {table_name} ({cols_escaped}) VALUES ({placeholders})"
-    )
-    cursor.fast_executemany = True
 
-    # Loop over pandas chunks
-    for chunk_df in read_csv_in_chunks(
-        file_path, columns, chunk_size=IngestionConfig.CHUNK_SIZE
-    ):
-        # convert all columns to string to match VARCHAR or actual types
-        rows = [tuple(row) for row in chunk_df.itertuples(index=False, name=None)]
-        cursor.executemany(insert_sql, rows)
-        logging.info(f"  → inserted {len(rows)} rows into `{table_name}`")
+def _ingest_one(args: Tuple[str, str, str, Optional[List[str]]]) -> None:
+    """
+    Process-pool entrypoint: unpack one job and ingest that file.
+    """
+    ingest_table_from_csv(*args)
 
 
 def ingest_folder(
     folder_path: str,
-    cursor: pyodbc.Cursor,
+    conn_string: str = IngestionConfig.CONN_STRING,
     file_extension: str = IngestionConfig.FILE_EXTENSION,
     column_types: Optional[List[str]] = None,
+    max_workers: Optional[int] = IngestionConfig.MAX_WORKERS,
+    log_file: str = IngestionConfig.LOG_FILE,
+    log_level: int = IngestionConfig.LOG_LEVEL,
 ) -> None:
     """
-    Ingest every CSV in a folder into its own table.
+    Ingest every CSV in a folder into its own table, one worker per file.
     """
     if not os.path.isdir(folder_path):
         logging.error(f"Folder not found: {folder_path}")
         return
 
-    for fname in os.listdir(folder_path):
-        if not fname.lower().endswith(file_extension.lower()):
-            continue
-        ingest_table_from_csv(cursor, folder_path, fname, column_types)
+    # One directory pass; DirEntry knows the entry type from the listing,
+    # and only the matching files need a stat() for the size check
+    fnames = []
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if not entry.name.lower().endswith(file_extension.lower()):
+                continue
+            if not entry.is_file():
+                continue
+            if entry.stat().st_size == 0:
+                logging.warning(f"Skipping empty file: {entry.path}")
+                continue
+            fnames.append(entry.name)
+    if not fnames:
+        logging.warning(f"No `{file_extension}` files in `{folder_path}`")
+        return
+
+    # Files map to independent tables, so they can load in parallel
+    workers = min(len(fnames), max_workers or os.cpu_count() or 1)
+    logging.info(f"Ingesting {len(fnames)} files from `{folder_path}` with {workers} workers")
+    jobs = [(conn_string, folder_path, fname, column_types) for fname in fnames]
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=setup_logging,
+        initargs=(log_file, log_level),
+    ) as ex:
+        list(ex.map(_ingest_one, jobs))
 
     logging.info(f"Finished ingesting all files in `{folder_path}`")
 
@@ -113,16 +116,16 @@ def main(
     setup_logging(log_file, log_level)
     logging.info("Starting ingestion process")
 
-    with get_db_connection(conn_string) as cursor:
-        for folder in folders:
-            ingest_folder(
-                folder_path=folder,
-                cursor=cursor,
-                file_extension=file_extension,
-                column_types=column_types,
-            )
-        # commit after all folders
-        cursor.connection.commit()
+    # each worker commits its own file
+    for folder in folders:
+        ingest_folder(
+            folder_path=folder,
+            conn_string=conn_string,
+            file_extension=file_extension,
+            column_types=column_types,
+            log_file=log_file,
+            log_level=log_level,
+        )
 
     logging.info("Ingestion complete — now running aggregation")
     aggregate_and_store(
@@ -1,11 +1,22 @@
+import csv
 import logging
+import queue
+import re
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple, Union
 
 import pandas as pd
 import pyodbc
 from contextlib import contextmanager
 
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # optional: multi-threaded streaming CSV reader
+    pa = None
+
 # -------------------------------------------------------------------
 # Configuration
 # -------------------------------------------------------------------
@@ -22,6 +33,42 @@ class IngestionConfig:
     FILE_EXTENSION = ".csv"
     LOG_LEVEL      = logging.DEBUG
     ENCODING       = "utf-8"
+    # Load via server-side BULK INSERT when SQL Server can read the file;
+    # falls back to chunked executemany otherwise.
+    BULK_INSERT    = True
+    MAX_WORKERS    = None      # parallel file loads; None → os.cpu_count()
+    # ODBC parameter arrays; disable for drivers without support, in which
+    # case inserts fall back to multi-row VALUES statements
+    FAST_EXECUTEMANY = True
+    PREFETCH_CHUNKS  = 2      # parsed chunks buffered ahead of the inserter
+    ARROW_BLOCK_SIZE = 64 << 20  # bytes per PyArrow batch (pandas uses CHUNK_SIZE rows)
+
+    # Typed staging columns; anything not listed lands as VARCHAR(MAX)
+    TABLE_SCHEMAS = {
+        "vendor_invoice": {
+            "VendorNumber": "BIGINT NULL", "Freight": "DECIMAL(18,2) NULL",
+        },
+        "purchases": {
+            "VendorNumber": "BIGINT NULL", "Brand": "BIGINT NULL",
+            "PurchasePrice": "DECIMAL(18,2) NULL", "Quantity": "BIGINT NULL",
+            "Dollars": "DECIMAL(18,2) NULL",
+        },
+        "purchase_prices": {
+            "Brand": "BIGINT NULL", "Price": "DECIMAL(18,2) NULL", "Volume": "BIGINT NULL",
+        },
+        "sales": {
+            "VendorNo": "BIGINT NULL", "Brand": "BIGINT NULL",
+            "SalesQuantity": "BIGINT NULL", "SalesDollars": "DECIMAL(18,2) NULL",
+            "SalesPrice": "DECIMAL(18,2) NULL", "ExciseTax": "DECIMAL(18,2) NULL",
+        },
+    }
+    # Clustered index keys, built after each table is loaded
+    TABLE_INDEXES = {
+        "vendor_invoice":  ["VendorNumber"],
+        "purchases":       ["VendorNumber", "Brand"],
+        "purchase_prices": ["Brand"],
+        "sales":           ["VendorNo", "Brand"],
+    }
 
 
 # -------------------------------------------------------------------
@@ -65,12 +112,12 @@ def get_db_connection(
     autocommit: bool = False
 ):
     """
-    Yields a pyodbc cursor with fast_executemany enabled.
+    Yields a pyodbc cursor with fast_executemany per IngestionConfig.
     Caller must commit if autocommit=False.
     """
     conn = pyodbc.connect(conn_string, autocommit=autocommit)
     cursor = conn.cursor()
-    cursor.fast_executemany = True
+    cursor.fast_executemany = IngestionConfig.FAST_EXECUTEMANY
     try:
         yield cursor
         if not autocommit:
@@ -83,6 +130,21 @@ def get_db_connection(
 # -------------------------------------------------------------------
 # Table Management
 # -------------------------------------------------------------------
+def resolve_column_types(
+    table_name: str,
+    columns: List[str],
+    column_types: Optional[List[str]] = None
+) -> List[str]:
+    """
+    Explicit types win; otherwise use IngestionConfig.TABLE_SCHEMAS,
+    defaulting unknown columns to VARCHAR(MAX).
+    """
+    if column_types is not None:
+        return column_types
+    schema = IngestionConfig.TABLE_SCHEMAS.get(table_name, {})
+    return [schema.get(c, "VARCHAR(MAX) NULL") for c in columns]
+
+
 def ensure_table(
     cursor: pyodbc.Cursor,
     table_name: str,
@@ -93,13 +155,96 @@ def ensure_table(
     Drop & recreate table with the given schema.
     """
     logging.info(f"Recreating table `{table_name}`")
+    # Schema-bound (indexed) views block DROP TABLE; aggregation rebuilds them
+    cursor.execute(f"""
+        DECLARE @sql NVARCHAR(MAX) = N'';
+        SELECT @sql += N'DROP VIEW ' + QUOTENAME(OBJECT_SCHEMA_NAME(v.referencing_id))
+                     + N'.' + QUOTENAME(OBJECT_NAME(v.referencing_id)) + N';'
+        FROM (
+            SELECT DISTINCT d.referencing_id
+            FROM sys.sql_expression_dependencies d
+            JOIN sys.views sv ON sv.object_id = d.referencing_id
+            WHERE d.referenced_id = OBJECT_ID(N'{table_name}')
+              AND d.is_schema_bound_reference = 1
+        ) v;
+        EXEC sp_executesql @sql;
+    """)
     cursor.execute(f"IF OBJECT_ID(N'{table_name}', 'U') IS NOT NULL DROP TABLE {table_name};")
-    if column_types is None:
-        column_types = ["VARCHAR(MAX) NULL"] * len(columns)
+    column_types = resolve_column_types(table_name, columns, column_types)
     col_defs = ", ".join(f"[{col}] {col_type}" for col, col_type in zip(columns, column_types))
     cursor.execute(f"CREATE TABLE {table_name} ({col_defs});")
 
 
+def multirow_insert(
+    cursor: pyodbc.Cursor,
+    table_name: str,
+    columns: List[str],
+    rows: List[tuple]
+) -> None:
+    """
+    Insert rows as multi-row INSERT … VALUES statements (≤1000 rows and
+    <2100 parameters each). Without fast_executemany, plain executemany
+    costs one round trip per row.
+    """
+    col_list = ", ".join(f"[{c}]" for c in columns)
+    row_ph = "(" + ", ".join("?" for _ in columns) + ")"
+    per_stmt = max(1, min(1000, 2099 // len(columns)))
+
+    def values_sql(n: int) -> str:
+        return f"INSERT INTO {table_name} ({col_list}) VALUES " + ", ".join([row_ph] * n)
+
+    full_sql = values_sql(per_stmt)
+    for start in range(0, len(rows), per_stmt):
+        batch = rows[start : start + per_stmt]
+        sql = full_sql if len(batch) == per_stmt else values_sql(len(batch))
+        cursor.execute(sql, [v for row in batch for v in row])
+
+
+def create_indexes(cursor: pyodbc.Cursor, table_name: str) -> None:
+    """
+    Build the configured clustered index once the table is loaded.
+    """
+    index_cols = IngestionConfig.TABLE_INDEXES.get(table_name)
+    if not index_cols:
+        return
+    col_list = ", ".join(f"[{c}]" for c in index_cols)
+    logging.info(f"Indexing `{table_name}` on ({col_list})")
+    cursor.execute(f"CREATE CLUSTERED INDEX ix_{table_name} ON {table_name} ({col_list});")
+
+
+def bulk_insert_csv(
+    cursor: pyodbc.Cursor,
+    table_name: str,
+    file_path: Path,
+    f: BinaryIO
+) -> bool:
+    """
+    Load a CSV with SQL Server's native BULK INSERT.
+    Returns False if the server could not read or convert the file, so the
+    caller can fall back to a client-side insert. `f` is the caller's open
+    handle, used to detect LF vs CRLF row endings.
+    """
+    pos = f.tell()
+    f.seek(0)
+    row_terminator = "0x0d0a" if f.readline().endswith(b"\r\n") else "0x0a"
+    f.seek(pos)
+
+    server_path = str(Path(file_path).resolve()).replace("'", "''")
+    try:
+        # MAXERRORS=0: any unconvertible value fails the whole load (and the
+        # caller's coercing fallback runs) instead of silently dropping rows
+        cursor.execute(
+            f"BULK INSERT {table_name} FROM '{server_path}' "
+            f"WITH (FIRSTROW=2, FIELDTERMINATOR=',', ROWTERMINATOR='{row_terminator}', "
+            "MAXERRORS=0, TABLOCK, CODEPAGE='65001', FORMAT='CSV');"
+        )
+    except pyodbc.Error as e:
+        logging.warning(f"BULK INSERT failed for `{file_path}` ({e}); using executemany")
+        return False
+    logging.info(f"  → bulk-inserted {cursor.rowcount} rows into `{table_name}`")
+    return True
+
+
 # -------------------------------------------------------------------
 # File Discovery
 # -------------------------------------------------------------------
@@ -116,45 +261,278 @@ def list_csv_files(
 # -------------------------------------------------------------------
 # Ingestion
 # -------------------------------------------------------------------
+def read_csv_header(
+    f: BinaryIO,
+    encoding: str = IngestionConfig.ENCODING
+) -> List[str]:
+    """
+    Consume the header row of a CSV opened in binary mode and return its
+    sanitized column names; the handle is left at the first data row.
+    """
+    # csv.reader honours quoted commas; utf-8-sig drops a leading BOM
+    if encoding.lower() in ("utf-8", "utf8"):
+        encoding = "utf-8-sig"
+    raw_cols = next(csv.reader([f.readline().decode(encoding)]))
+    return [c.strip().replace(" ", "_") for c in raw_cols]
+
+
+def read_csv_chunks(
+    source: Union[Path, BinaryIO],
+    columns: List[str],
+    encoding: str = IngestionConfig.ENCODING,
+    chunk_size: int = IngestionConfig.CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield all-string DataFrame chunks of a CSV. `source` is either a path
+    (header row skipped) or a binary handle already past the header, as
+    left by `read_csv_header`, so the file is only opened once.
+    Uses PyArrow's multi-threaded streaming reader when installed;
+    either way no chunk exceeds `chunk_size` rows.
+    """
+    is_handle = not isinstance(source, (str, Path))
+    if is_handle:
+        # header-only file: both readers reject an empty stream, so yield
+        # no chunks (as the path-based header skip does)
+        pos = source.tell()
+        if not source.read(1):
+            return
+        source.seek(pos)
+    if pa is None:
+        # empty strings instead of NaN
+        yield from pd.read_csv(
+            source,
+            header=None if is_handle else 0,
+            names=columns,
+            chunksize=chunk_size,
+            dtype=str,
+            encoding=encoding,
+            na_filter=False
+        )
+        return
+
+    reader = pa_csv.open_csv(
+        source if is_handle else str(source),
+        read_options=pa_csv.ReadOptions(
+            block_size=IngestionConfig.ARROW_BLOCK_SIZE,
+            column_names=columns,
+            skip_rows=0 if is_handle else 1,
+            encoding=encoding
+        ),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={c: pa.string() for c in columns},
+            strings_can_be_null=False
+        )
+    )
+    # Arrow batches follow block_size, not row counts; slice them so
+    # chunk_size bounds every chunk on both paths
+    for batch in reader:
+        for offset in range(0, batch.num_rows, chunk_size):
+            yield batch.slice(offset, chunk_size).to_pandas()
+
+
+def prefetch(
+    chunks: Iterator[pd.DataFrame],
+    depth: int = IngestionConfig.PREFETCH_CHUNKS
+) -> Iterator[pd.DataFrame]:
+    """
+    Produce `chunks` on a background thread so parsing overlaps the
+    caller's DB round trips; the bounded queue caps memory at `depth` chunks.
+    """
+    q: queue.Queue = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def put(item) -> None:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def producer() -> None:
+        try:
+            for chunk in chunks:
+                put(chunk)
+                if stop.is_set():
+                    return
+        except BaseException as e:  # re-raised in the consumer
+            put(e)
+        finally:
+            # always unblock the consumer, whatever ended the producer
+            put(done)
+
+    worker = threading.Thread(target=producer, name="csv-prefetch", daemon=True)
+    worker.start()
+    try:
+        while (item := q.get()) is not done:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        worker.join()
+
+
+def prepare_chunk(df: pd.DataFrame, column_types: List[str]) -> pd.DataFrame:
+    """
+    Cast typed columns with one vectorized pass each; unparseable values
+    become NULL, as TRY_CAST did when the staging columns were VARCHAR.
+    Empty VARCHAR fields become NULL too, matching what BULK INSERT loads.
+    """
+    for col, col_type in zip(df.columns, column_types):
+        kind = col_type.upper()
+        if kind.startswith("VARCHAR"):
+            df[col] = df[col].replace({"": None})
+            continue
+        if kind.startswith("BIGINT"):
+            # Integer literals only, parsed straight to int64: a float64
+            # detour would round anything above 2**53
+            text = df[col].str.strip()
+            digits = text[text.str.fullmatch(r"[+-]?\d+", na=False)]
+            parsed = pd.to_numeric(digits, errors="coerce")
+            if parsed.dtype.kind != "i":
+                # some value overflows int64; drop just those
+                parsed = digits.map(int)
+                parsed = parsed[(parsed >= -2**63) & (parsed < 2**63)]
+            values = pd.Series(pd.NA, index=df.index, dtype="Int64")
+            values.loc[parsed.index] = parsed.astype("int64")
+        elif kind.startswith("DECIMAL"):
+            values = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        else:
+            continue
+        # pyodbc binds None, not NaN / pd.NA
+        df[col] = values.astype(object).where(values.notna(), None)
+    return df
+
+
+def input_sizes(
+    rows: Sequence[Sequence],
+    column_types: List[str]
+) -> List[Tuple[int, int, int]]:
+    """
+    Explicit ODBC parameter bindings for `cursor.setinputsizes`, so
+    fast_executemany doesn't size buffers from the first row and fall back
+    to per-row binding when a later value is longer.
+    `rows` is the batch of row tuples about to be inserted.
+    """
+    def max_width(i: int) -> int:
+        return max((len(str(row[i])) for row in rows if row[i] is not None), default=0)
+
+    sizes = []
+    for i, col_type in enumerate(column_types):
+        kind = col_type.upper()
+        if kind.startswith("BIGINT"):
+            sizes.append((pyodbc.SQL_BIGINT, 0, 0))
+        elif kind.startswith("DECIMAL"):
+            m = re.search(r"\((\d+)\s*,\s*(\d+)\)", kind)
+            precision, scale = (int(m.group(1)), int(m.group(2))) if m else (18, 2)
+            sizes.append((pyodbc.SQL_DECIMAL, precision, scale))
+        else:
+            # widest value in the batch, at least 1 so an all-empty/NULL
+            # batch stays bounded; 0 (= MAX) only beyond NVARCHAR(4000)
+            max_len = max(1, max_width(i))
+            sizes.append((pyodbc.SQL_WVARCHAR, max_len if max_len <= 4000 else 0, 0))
+    return sizes
+
+
+def widen_input_sizes(
+    bound: Optional[List[Tuple[int, int, int]]],
+    sizes: List[Tuple[int, int, int]]
+) -> List[Tuple[int, int, int]]:
+    """
+    Column-wise widest of two `input_sizes` results, so bindings only
+    change when a batch needs more room. A VARCHAR size of 0 means MAX and
+    only arises from a value over 4000 characters, so it always wins.
+    """
+    if bound is None:
+        return sizes
+    widened = []
+    for (sql_type, old_size, digits), (_, new_size, _) in zip(bound, sizes):
+        if sql_type == pyodbc.SQL_WVARCHAR and 0 in (old_size, new_size):
+            widened.append((sql_type, 0, digits))
+        else:
+            widened.append((sql_type, max(old_size, new_size), digits))
+    return widened
+
+
+@lru_cache(maxsize=None)
+def _insert_sql(table_name: str, columns: Tuple[str, ...]) -> str:
+    # One string object per table: pyodbc re-prepares when the SQL changes
+    col_list = ", ".join(f"[{c}]" for c in columns)
+    placeholders = ", ".join("?" for _ in columns)
+    return f"INSERT INTO {table_name} ({col_list}) VALUES ({placeholders})"
+
+
+def insert_rows(
+    cursor: pyodbc.Cursor,
+    table_name: str,
+    columns: List[str],
+    column_types: List[str],
+    rows: List[tuple],
+    bound: Optional[List[Tuple[int, int, int]]] = None
+) -> Optional[List[Tuple[int, int, int]]]:
+    """
+    Insert one batch of row tuples: parameter-array executemany with
+    explicit bindings when fast_executemany is on, multi-row VALUES
+    otherwise. Pass the returned bindings back in with the next batch so
+    the cursor is only re-bound when a batch needs wider buffers, and
+    call `cursor.setinputsizes(None)` once the last batch is in.
+    """
+    if not cursor.fast_executemany:
+        multirow_insert(cursor, table_name, columns, rows)
+        return bound
+    sizes = widen_input_sizes(bound, input_sizes(rows, column_types))
+    if sizes != bound:
+        cursor.setinputsizes(sizes)
+    cursor.executemany(_insert_sql(table_name, tuple(columns)), rows)
+    return sizes
+
+
 def ingest_file(
     cursor: pyodbc.Cursor,
-    file_path: Path,
+    file_path: Union[str, Path],
     table_name: str,
     chunk_size: int = IngestionConfig.CHUNK_SIZE,
     column_types: Optional[List[str]] = None
 ) -> None:
     """
-    Stream a CSV into `table_name` in chunks.
+    Load a CSV into `table_name`: server-side BULK INSERT when possible,
+    otherwise stream it in chunks. The caller owns (and commits) `cursor`;
+    the recreated table is committed before a BULK INSERT is attempted.
     """
     logging.info(f"Ingesting `{file_path}` → `{table_name}`")
 
-    # Read header-only to sanitize column names
-    header_df = pd.read_csv(
-        file_path,
-        nrows=0,
-        encoding=IngestionConfig.ENCODING
-    )
-    columns = [col.strip().replace(" ", "_") for col in header_df.columns]
-    ensure_table(cursor, table_name, columns, column_types)
+    # One open serves both the header and the chunked reader
+    with open(file_path, "rb") as f:
+        columns = read_csv_header(f)
+        column_types = resolve_column_types(table_name, columns, column_types)
+        ensure_table(cursor, table_name, columns, column_types)
 
-    # Pre-build insert SQL
-    cols_esc = ", ".join(f"[{c}]" for c in columns)
-    placeholders = ", ".join("?" for _ in columns)
-    insert_sql = f"INSERT INTO {table_name} ({cols_esc}) VALUES ({placeholders})"
-
-    # Stream data in chunks
-    for batch_idx, df_chunk in enumerate(pd.read_csv(
-        file_path,
-        header=0,
-        names=columns,
-        chunksize=chunk_size,
-        dtype=str,
-        encoding=IngestionConfig.ENCODING,
-        na_filter=False
-    )):
-        rows = [tuple(row) for row in df_chunk.itertuples(index=False, name=None)]
-        cursor.executemany(insert_sql, rows)
-        logging.info(f"  • Batch {batch_idx + 1}: inserted {len(rows)} rows")
+        if IngestionConfig.BULK_INSERT:
+            # A failed BULK INSERT (e.g. 4864 → 7399) can roll back the whole
+            # transaction; commit the fresh table first so the fallback
+            # never writes into a restored old one
+            cursor.connection.commit()
+            if bulk_insert_csv(cursor, table_name, file_path, f):
+                create_indexes(cursor, table_name)
+                return
+
+        # Stream data in chunks; parse + cast on a producer thread
+        chunks = (
+            prepare_chunk(df_chunk, column_types)
+            for df_chunk in read_csv_chunks(f, columns, chunk_size=chunk_size)
+        )
+        bound = None
+        try:
+            for batch_idx, df_chunk in enumerate(prefetch(chunks)):
+                rows = list(zip(*[df_chunk[c].tolist() for c in columns]))
+                bound = insert_rows(cursor, table_name, columns, column_types, rows, bound)
+                logging.info(f"  • Batch {batch_idx + 1}: inserted {len(rows)} rows")
+        finally:
+            cursor.setinputsizes(None)
+
+        create_indexes(cursor, table_name)
 
 
 # -------------------------------------------------------------------